@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import argparse
 from datetime import datetime
-from src.scraper import FirehoseScraper
+from src.scraper import SkyScraper
 
 def main():
     parser = argparse.ArgumentParser(description='Collect posts from the Bluesky firehose')
@@ -14,11 +14,21 @@ def main():
     parser.add_argument('-v', '--verbose', action='store_true',
                       help='Print each post as it is collected')
     parser.add_argument('-w', '--workers', type=int, default=4,
-                      help='Number of worker processes (default: 4)')
+                      help='Number of workers (default: 4)')
+    parser.add_argument('--mode', choices=['process', 'thread'], default='thread',
+                      help='Run workers as threads or processes (default: thread)')
+    parser.add_argument('--queue', choices=['auto', 'faster-fifo', 'ring', 'sqlite', 'queue'],
+                      default='auto',
+                      help='Ingest queue backend (default: auto)')
+    parser.add_argument('--writer', choices=['process', 'direct'], default='process',
+                      help='Write output via a writer process or directly from workers '
+                           '(default: process)')
 
     args = parser.parse_args()
 
-    scraper = FirehoseScraper(output_file=args.output, verbose=args.verbose, num_workers=args.workers)
+    scraper = SkyScraper(output_file=args.output, verbose=args.verbose,
+                         num_workers=args.workers, mode=args.mode,
+                         queue_backend=args.queue, writer_mode=args.writer)
     scraper.start_collection(duration_seconds=args.time, post_limit=args.number)
 
 if __name__ == "__main__":
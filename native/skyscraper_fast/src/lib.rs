@@ -0,0 +1,194 @@
+//! Native decode path for skyscraper.
+//!
+//! Parses a raw firehose frame (header + #commit body, both DAG-CBOR),
+//! filters its ops for `app.bsky.feed.post/` creates, and decodes only the
+//! matching CAR blocks, returning just the fields the Python side reads.
+//! The whole parse runs with the GIL released.
+
+use std::collections::{BTreeMap, HashMap};
+use std::io::Cursor;
+
+use cid::Cid;
+use ipld_core::ipld::Ipld;
+use pyo3::exceptions::PyValueError;
+use pyo3::prelude::*;
+
+/// The subset of a post record that skyscraper keeps.
+#[pyclass(frozen)]
+#[derive(Clone)]
+pub struct PostRecord {
+    #[pyo3(get)]
+    pub repo: String,
+    #[pyo3(get)]
+    pub path: String,
+    #[pyo3(get)]
+    pub text: String,
+    #[pyo3(get)]
+    pub created_at: String,
+    #[pyo3(get)]
+    pub has_images: bool,
+    #[pyo3(get)]
+    pub reply_to: Option<String>,
+}
+
+fn read_uvarint(buf: &[u8], pos: &mut usize) -> Option<u64> {
+    let mut value: u64 = 0;
+    let mut shift = 0u32;
+    while *pos < buf.len() {
+        let byte = buf[*pos];
+        *pos += 1;
+        value |= u64::from(byte & 0x7f) << shift;
+        if byte & 0x80 == 0 {
+            return Some(value);
+        }
+        shift += 7;
+        if shift >= 64 {
+            return None;
+        }
+    }
+    None
+}
+
+fn as_str<'a>(map: &'a BTreeMap<String, Ipld>, key: &str) -> Option<&'a str> {
+    match map.get(key) {
+        Some(Ipld::String(s)) => Some(s.as_str()),
+        _ => None,
+    }
+}
+
+fn as_map(value: &Ipld) -> Option<&BTreeMap<String, Ipld>> {
+    match value {
+        Ipld::Map(m) => Some(m),
+        _ => None,
+    }
+}
+
+/// Decode the CAR payload into a cid -> record map, keeping only post records.
+fn decode_post_blocks(blocks: &[u8]) -> HashMap<Cid, BTreeMap<String, Ipld>> {
+    let mut records = HashMap::new();
+    let mut pos = 0usize;
+
+    // Skip the CAR header (varint length + DAG-CBOR header block)
+    let Some(header_len) = read_uvarint(blocks, &mut pos) else {
+        return records;
+    };
+    pos += header_len as usize;
+
+    // Each section is: varint(section length) | cid | block bytes
+    while pos < blocks.len() {
+        let Some(section_len) = read_uvarint(blocks, &mut pos) else {
+            break;
+        };
+        let end = pos + section_len as usize;
+        if end > blocks.len() {
+            break;
+        }
+        let mut cursor = Cursor::new(&blocks[pos..end]);
+        let Ok(cid) = Cid::read_bytes(&mut cursor) else {
+            pos = end;
+            continue;
+        };
+        let block = &blocks[pos + cursor.position() as usize..end];
+        pos = end;
+
+        let Ok(value) = serde_ipld_dagcbor::from_slice::<Ipld>(block) else {
+            continue;
+        };
+        if let Ipld::Map(map) = value {
+            if as_str(&map, "$type") == Some("app.bsky.feed.post") {
+                records.insert(cid, map);
+            }
+        }
+    }
+    records
+}
+
+fn record_has_images(record: &BTreeMap<String, Ipld>) -> bool {
+    let Some(embed) = record.get("embed").and_then(as_map) else {
+        return false;
+    };
+    match as_str(embed, "$type") {
+        Some("app.bsky.embed.images") => true,
+        Some("app.bsky.embed.external") => embed.contains_key("thumb"),
+        _ => false,
+    }
+}
+
+fn record_reply_to(record: &BTreeMap<String, Ipld>) -> Option<String> {
+    let reply = record.get("reply").and_then(as_map)?;
+    let parent = reply.get("parent").and_then(as_map)?;
+    as_str(parent, "uri").map(str::to_owned)
+}
+
+fn parse_inner(message: &[u8]) -> Result<Vec<PostRecord>, String> {
+    // A frame is two concatenated DAG-CBOR values: header, then body
+    let mut cursor = Cursor::new(message);
+    let header: Ipld =
+        serde_ipld_dagcbor::from_reader(&mut cursor).map_err(|e| e.to_string())?;
+    match header {
+        Ipld::Map(ref map) if as_str(map, "t") == Some("#commit") => {}
+        _ => return Ok(Vec::new()),
+    }
+    let body: Ipld = serde_ipld_dagcbor::from_reader(&mut cursor).map_err(|e| e.to_string())?;
+    let Some(body) = as_map(&body) else {
+        return Ok(Vec::new());
+    };
+
+    // Collect the create ops for posts before touching the CAR at all
+    let Some(Ipld::List(ops)) = body.get("ops") else {
+        return Ok(Vec::new());
+    };
+    let mut post_ops: Vec<(&str, &Cid)> = Vec::new();
+    for op in ops {
+        let Some(op) = as_map(op) else { continue };
+        if as_str(op, "action") != Some("create") {
+            continue;
+        }
+        let Some(path) = as_str(op, "path") else { continue };
+        if !path.starts_with("app.bsky.feed.post/") {
+            continue;
+        }
+        if let Some(Ipld::Link(cid)) = op.get("cid") {
+            post_ops.push((path, cid));
+        }
+    }
+    if post_ops.is_empty() {
+        return Ok(Vec::new());
+    }
+
+    let Some(repo) = as_str(body, "repo") else {
+        return Ok(Vec::new());
+    };
+    let Some(Ipld::Bytes(blocks)) = body.get("blocks") else {
+        return Ok(Vec::new());
+    };
+
+    let records = decode_post_blocks(blocks);
+    let mut posts = Vec::with_capacity(post_ops.len());
+    for (path, cid) in post_ops {
+        let Some(record) = records.get(cid) else { continue };
+        posts.push(PostRecord {
+            repo: repo.to_owned(),
+            path: path.to_owned(),
+            text: as_str(record, "text").unwrap_or_default().to_owned(),
+            created_at: as_str(record, "createdAt").unwrap_or_default().to_owned(),
+            has_images: record_has_images(record),
+            reply_to: record_reply_to(record),
+        });
+    }
+    Ok(posts)
+}
+
+/// Parse a raw firehose frame and return its post-create records.
+#[pyfunction]
+fn parse_post_ops(py: Python<'_>, message: &[u8]) -> PyResult<Vec<PostRecord>> {
+    py.allow_threads(|| parse_inner(message))
+        .map_err(PyValueError::new_err)
+}
+
+#[pymodule]
+fn skyscraper_fast(m: &Bound<'_, PyModule>) -> PyResult<()> {
+    m.add_class::<PostRecord>()?;
+    m.add_function(wrap_pyfunction!(parse_post_ops, m)?)?;
+    Ok(())
+}
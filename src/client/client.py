@@ -1,62 +1,133 @@
 """
 Handles connecting to and receiving messages from the Bluesky firehose.
-It provides functions for starting a client process that pushes firehose messages
-to a shared queue for further processing.
+It provides functions for starting a client process that pushes batches of
+firehose messages to a shared queue for further processing. Batching turns one
+queue operation (lock, pickle, wakeup) per frame into one per batch.
 
 functions:
-client_process: Connects to the Bluesky firehose, forwarding messages to a shared queue until the stop event is triggered.
+client_process: Connects to the Bluesky firehose, forwarding message batches to a shared queue until the stop event is triggered.
 start_client_process: Starts a new process for the firehose client.
+start_client_thread: Runs the firehose client as a thread in the current process.
 """
 
 from atproto import FirehoseSubscribeReposClient
-import multiprocessing
+from ..process.transport import MP_CONTEXT
+import threading
+import time
+
+# Enqueue a batch once it reaches this many messages...
+CLIENT_BATCH_SIZE = 128
+# ...or once its oldest message has waited this many seconds.
+CLIENT_FLUSH_INTERVAL = 0.05
 
 
 def client_process(queue, stop_event):
     """
-    Process that connects to the Bluesky firehose and forwards messages to a queue.
-    
+    Process that connects to the Bluesky firehose and forwards message batches to a queue.
+
+    Messages are accumulated locally and enqueued as a single list every
+    CLIENT_BATCH_SIZE messages; a small flusher thread pushes a partial batch
+    once its oldest message has waited CLIENT_FLUSH_INTERVAL seconds, so
+    batches fill up under load but quiet periods add bounded latency.
+
     Args:
-        queue: A multiprocessing Queue where firehose messages will be placed
-        stop_event: A multiprocessing Event that signals when to stop the client
+        queue: The ingest queue where firehose message batches will be placed
+        stop_event: An Event that signals when to stop the client
     """
     client = FirehoseSubscribeReposClient()
-    
+    pending = []
+    pending_since = None
+    pending_lock = threading.Lock()
+
+    def flush():
+        nonlocal pending, pending_since
+        with pending_lock:
+            batch, pending = pending, []
+            pending_since = None
+        if batch:
+            queue.put(batch)
+
     def message_handler(message):
         """
         Callback function that receives messages from the firehose.
-        Places each message in the shared queue for processing.
-        
+        Appends each message to the pending batch, flushing when it is full.
+
         Args:
             message: A raw firehose message
         """
+        nonlocal pending_since
         if stop_event.is_set():
             client.stop()
             return
-        queue.put(message)
-    
+        with pending_lock:
+            if not pending:
+                pending_since = time.time()
+            pending.append(message)
+            full = len(pending) >= CLIENT_BATCH_SIZE
+        if full:
+            flush()
+
+    def flusher():
+        while not stop_event.is_set():
+            time.sleep(CLIENT_FLUSH_INTERVAL / 2)
+            with pending_lock:
+                expired = pending_since is not None and \
+                    time.time() - pending_since >= CLIENT_FLUSH_INTERVAL
+            if expired:
+                flush()
+
+    threading.Thread(target=flusher, daemon=True).start()
+
     try:
         # Start the firehose client with our message handler
         client.start(message_handler)
     except Exception as e:
         if not stop_event.is_set():
             print(f"Client process error: {e}")
+    finally:
+        flush()
 
 
 def start_client_process(queue, stop_event):
     """
     Start a new process for the firehose client.
-    
+
     Args:
-        queue: A multiprocessing Queue where firehose messages will be placed
-        stop_event: A multiprocessing Event that signals when to stop the client
-        
+        queue: The ingest queue where firehose message batches will be placed
+        stop_event: An Event that signals when to stop the client
+
     Returns:
         The created client process object
     """
-    client_proc = multiprocessing.Process(
+    client_proc = MP_CONTEXT.Process(
         target=client_process,
         args=(queue, stop_event)
     )
     client_proc.start()
-    return client_proc
\ No newline at end of file
+    return client_proc
+
+
+def start_client_thread(queue, stop_event):
+    """
+    Run the firehose client as a daemon thread in the current process.
+
+    Used in thread mode, where the workers are threads too: the whole app
+    fits in one process, so frames reach the ingest queue by reference with
+    no client process to spawn and nothing pickled. The firehose client is
+    I/O-bound and releases the GIL while receiving, so throughput matches
+    the process variant.
+
+    Args:
+        queue: The ingest queue where firehose message batches will be placed
+        stop_event: An Event that signals when to stop the client
+
+    Returns:
+        The created client thread object
+    """
+    client_thread = threading.Thread(
+        target=client_process,
+        args=(queue, stop_event),
+        daemon=True
+    )
+    client_thread.start()
+    return client_thread
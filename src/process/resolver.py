@@ -1,23 +1,213 @@
 """
-Resolves the author handle from a DID. Uses the resolver to fetch the handle and returns the first known handle. 
-If resolution fails, it returns the original DID.
-
+Resolves author handles from DIDs through a single shared resolver process.
+The resolver process fronts atproto's IdResolver with a TTL-bounded LRU cache,
+so a DID popular across all workers is resolved over the network once instead
+of once per worker, and cache memory stays bounded on long runs. Misses
+resolve concurrently on a small thread pool, so workers do not queue behind
+one slow network lookup. If resolution fails, the original DID is returned
+as a fallback.
 """
 
+from atproto import IdResolver, DidInMemoryCache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty
+import threading
+import time
+
+# Maximum number of DID -> handle entries kept in the shared cache
+RESOLVER_CACHE_SIZE = 100_000
+# Seconds a cached handle stays valid before being re-resolved
+RESOLVER_CACHE_TTL = 600
+# Seconds a worker waits for a resolver response before falling back to the DID
+RESOLVER_TIMEOUT = 5
+# Entries in each worker's local hot cache fronting the shared resolver
+RESOLVER_LOCAL_CACHE_SIZE = 1024
+# Cache misses resolved concurrently inside the resolver process; network
+# lookups are I/O-bound, so a cold cache must not serialize all workers
+# behind one blocking resolve
+RESOLVER_CONCURRENCY = 32
+
+
+class _TTLCache:
+    """
+    A small LRU cache whose entries expire after a fixed time-to-live.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self._data = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl = ttl
+
+    def get(self, key):
+        """Return the cached value for key, or None if absent or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if time.time() >= expires:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """Cache a value for key, evicting the least recently used on overflow."""
+        self._data[key] = (value, time.time() + self._ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+
+class ResolverClient:
+    """
+    Worker-side handle to the shared resolver process.
+
+    Holds only queues, so it can be passed to worker processes. A worker has
+    at most one request outstanding, so responses need no correlation ids.
+    A small local hot cache answers repeat DIDs without the queue round trip,
+    so only the long tail reaches the shared resolver process.
+    """
+
+    def __init__(self, worker_id, request_queue, response_queue):
+        self._worker_id = worker_id
+        self._request_queue = request_queue
+        self._response_queue = response_queue
+        self._local_cache = _TTLCache(RESOLVER_LOCAL_CACHE_SIZE, RESOLVER_CACHE_TTL)
+
+    def resolve(self, did):
+        """
+        Resolve a DID to a handle, consulting the local hot cache first and
+        the shared resolver process on a miss.
+
+        Args:
+            did: The DID to resolve
+
+        Returns:
+            The handle of the user or the original DID if resolution fails
+        """
+        handle = self._local_cache.get(did)
+        if handle is not None:
+            return handle
+        self._request_queue.put((self._worker_id, did))
+        # Replies echo the DID they answer: after a timeout the late reply
+        # for an earlier request may still arrive first, so keep reading
+        # (and caching) replies until ours shows up rather than pairing
+        # every reply with whatever was requested last
+        deadline = time.time() + RESOLVER_TIMEOUT
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return did  # Fallback to DID, uncached so it can be retried
+            try:
+                reply_did, handle = self._response_queue.get(timeout=remaining)
+            except Empty:
+                return did  # Fallback to DID, uncached so it can be retried
+            self._local_cache.set(reply_did, handle)
+            if reply_did == did:
+                return handle
+
+
+class LocalResolver:
+    """
+    In-process resolver shared by worker threads in thread mode.
+
+    Offers the same resolve() interface as ResolverClient, backed by one
+    IdResolver and the TTL cache directly — no resolver process or queues.
+    """
+
+    def __init__(self):
+        self._resolver = IdResolver(cache=DidInMemoryCache())
+        self._cache = _TTLCache(RESOLVER_CACHE_SIZE, RESOLVER_CACHE_TTL)
+        self._lock = threading.Lock()
+
+    def resolve(self, did):
+        """
+        Resolve a DID to a handle, consulting the shared cache first.
+
+        Args:
+            did: The DID to resolve
+
+        Returns:
+            The handle of the user or the original DID if resolution fails
+        """
+        with self._lock:
+            handle = self._cache.get(did)
+        if handle is None:
+            handle = _convert_did_to_handle(did, self._resolver)
+            with self._lock:
+                self._cache.set(did, handle)
+        return handle
+
+
+def resolver_process(request_queue, response_queues, stop_event):
+    """
+    Process that answers DID resolution requests for all workers.
+
+    Cache hits are answered inline; misses go to a small thread pool so one
+    slow network lookup never serializes every worker behind it, with each
+    reply sent as its resolve completes. Requests for a DID already being
+    resolved are parked on the in-flight entry and answered together, so a
+    cold-cache stampede costs one network resolve.
+
+    Args:
+        request_queue: A multiprocessing Queue of (worker_id, did) requests
+        response_queues: A list of per-worker multiprocessing Queues for replies
+        stop_event: A multiprocessing Event that signals when to stop
+    """
+    resolver = IdResolver(cache=DidInMemoryCache())
+    cache = _TTLCache(RESOLVER_CACHE_SIZE, RESOLVER_CACHE_TTL)
+    lock = threading.Lock()
+    in_flight = {}  # did -> worker ids awaiting its resolve
+    pool = ThreadPoolExecutor(max_workers=RESOLVER_CONCURRENCY)
+
+    def resolve_miss(did):
+        handle = _convert_did_to_handle(did, resolver)
+        with lock:
+            cache.set(did, handle)
+            waiters = in_flight.pop(did)
+        for waiter_id in waiters:
+            response_queues[waiter_id].put((did, handle))
+
+    while not stop_event.is_set():
+        try:
+            worker_id, did = request_queue.get(timeout=1)
+        except Empty:
+            continue
+        with lock:
+            handle = cache.get(did)
+            if handle is None:
+                waiters = in_flight.get(did)
+                if waiters is not None:
+                    waiters.append(worker_id)
+                    continue
+                in_flight[did] = [worker_id]
+        if handle is not None:
+            response_queues[worker_id].put((did, handle))
+        else:
+            pool.submit(resolve_miss, did)
+    pool.shutdown(wait=False)
+
+
 def _convert_did_to_handle(repo, resolver):
     """
     Resolve the author handle from the DID.
-    
+
     Args:
         repo: The DID of the repository (user)
         resolver: An IdResolver for resolving DIDs to handles
-        
+
     Returns:
         The handle of the user or the original DID if resolution fails
     """
     try:
         resolved_info = resolver.did.resolve(repo)
-        return resolved_info.also_known_as[0].split('at://')[1] if resolved_info.also_known_as else repo
+        if not resolved_info.also_known_as:
+            return repo
+        # Slice off the 'at://' scheme instead of split(), which builds a
+        # throwaway list; this runs on every resolver cache miss
+        aka = resolved_info.also_known_as[0]
+        return aka[5:] if aka.startswith('at://') else aka
     except Exception as e:
         print(f"Could not resolve handle for {repo}: {e}")
-        return repo  # Fallback to DID
\ No newline at end of file
+        return repo  # Fallback to DID
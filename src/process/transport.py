@@ -0,0 +1,461 @@
+"""
+Message transport between the firehose client and the worker processes.
+Prefers faster-fifo, a shared-memory queue whose batched put_many/get_many
+calls avoid the per-message lock and pipe round-trip of multiprocessing.Queue;
+falls back to SharedMemoryRing, a single-producer ring buffer over
+multiprocessing.shared_memory that passes raw bytes without pickling.
+QueueTransport wraps plain multiprocessing.Queue in the same interface.
+"""
+
+from multiprocessing import shared_memory
+from queue import Empty, Queue
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import struct
+import tempfile
+import time
+
+try:
+    import faster_fifo
+except ImportError:
+    faster_fifo = None
+
+# Explicit spawn context used for every process, queue, and event in the
+# scraper: fork would copy the parent heap (and fault it in on write), and
+# spawn keeps worker startup identical across platforms. All worker-side
+# state is built inside the worker entry points, so re-import is cheap.
+MP_CONTEXT = multiprocessing.get_context('spawn')
+
+# Shared-memory buffer size for the faster-fifo ingest queue
+INGEST_QUEUE_BYTES = 1 << 28
+# Maximum queued batches for the queue-backed transports: at client batch
+# size this holds a few seconds of firehose, so a stalled worker
+# backpressures the client instead of growing the queue until OOM. The
+# byte-sized backends are bounded by their buffer size instead.
+INGEST_QUEUE_MAXSIZE = 256
+# Maximum number of messages a worker pops per get_many call
+GET_MANY_MAX = 64
+
+# Shared-memory ring buffer capacity
+RING_BYTES = 1 << 26
+# Frame header: payload length (u32) plus a flag byte (0 raw bytes, 1 pickled,
+# 2 a batch of raw byte messages packed with length prefixes)
+_FRAME_HEADER = struct.Struct('<IB')
+# Length marker telling consumers to skip the padding at the end of the buffer
+_FRAME_SKIP = 0xFFFFFFFF
+# Per-message length prefix inside a packed batch frame
+_BATCH_LEN = struct.Struct('<I')
+
+
+def _pack_batch(messages):
+    """Pack a list of byte messages into one length-prefixed blob."""
+    parts = []
+    for message in messages:
+        parts.append(_BATCH_LEN.pack(len(message)))
+        parts.append(message)
+    return b''.join(parts)
+
+
+def _unpack_batch(data):
+    """Unpack a length-prefixed blob back into a list of byte messages."""
+    messages = []
+    pos = 0
+    end = len(data)
+    while pos < end:
+        (length,) = _BATCH_LEN.unpack_from(data, pos)
+        pos += _BATCH_LEN.size
+        messages.append(data[pos:pos + length])
+        pos += length
+    return messages
+
+
+class QueueTransport:
+    """
+    Batched put_many/get_many interface on top of multiprocessing.Queue.
+
+    Used when faster-fifo is not installed, so client and worker code can
+    target one interface regardless of the underlying queue. Bounded, so a
+    stalled consumer blocks the producer instead of exhausting memory.
+    """
+
+    def __init__(self):
+        self._queue = MP_CONTEXT.Queue(maxsize=INGEST_QUEUE_MAXSIZE)
+
+    def put(self, item):
+        """Put a single item on the queue."""
+        self._queue.put(item)
+
+    def put_many(self, items):
+        """Put a list of items on the queue."""
+        for item in items:
+            self._queue.put(item)
+
+    def get_many(self, max_messages_to_get=GET_MANY_MAX, timeout=1):
+        """
+        Pop up to max_messages_to_get items, blocking up to timeout for the first.
+
+        Args:
+            max_messages_to_get: Maximum number of items to return
+            timeout: Seconds to wait for the first item
+
+        Returns:
+            A non-empty list of items
+
+        Raises:
+            queue.Empty: If no item arrives within the timeout
+        """
+        items = [self._queue.get(timeout=timeout)]
+        while len(items) < max_messages_to_get:
+            try:
+                items.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return items
+
+    def qsize(self):
+        """Approximate number of queued batches, for lag diagnostics."""
+        return self._queue.qsize()
+
+
+class ThreadTransport(QueueTransport):
+    """
+    In-process variant of QueueTransport backed by queue.Queue.
+
+    Used in thread mode, where the client and workers share one process:
+    batches are handed over by reference with no pickling and no feeder
+    thread at all.
+    """
+
+    def __init__(self):
+        self._queue = Queue(maxsize=INGEST_QUEUE_MAXSIZE)
+
+
+class SharedMemoryRing:
+    """
+    Single-producer, multi-consumer ring buffer over shared memory.
+
+    The producer writes [length:u32][flag:u8][payload] frames directly into a
+    SharedMemory block and bumps a head counter; consumers pop under a small
+    consumer lock and bump the tail. Raw bytes — and lists of raw bytes —
+    cross processes with a memcpy and no pickling; anything else, including
+    the parsed frame objects the live client batches today, is pickled with
+    a flag byte so the ring can carry whatever the queue backends can. The
+    no-pickle path pays off once raw frame bytes are fed in, e.g. when
+    replaying stored frames. A semaphore counts frames, so
+    consumers block without polling; the producer spins briefly only when the
+    ring is full, which backpressures the firehose client.
+    """
+
+    def __init__(self, size=RING_BYTES):
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._size = size
+        self._owner = True
+        # Monotonic byte counters; single writer each, so no locks
+        self._head = MP_CONTEXT.Value('Q', 0, lock=False)
+        self._tail = MP_CONTEXT.Value('Q', 0, lock=False)
+        # Counts complete frames available to consumers
+        self._items = MP_CONTEXT.Semaphore(0)
+        # Serializes consumers advancing the tail
+        self._consumer_lock = MP_CONTEXT.Lock()
+
+    def __getstate__(self):
+        return (self._shm.name, self._size, self._head, self._tail,
+                self._items, self._consumer_lock)
+
+    def __setstate__(self, state):
+        name, self._size, self._head, self._tail, self._items, self._consumer_lock = state
+        self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = False
+
+    def put(self, item):
+        """Write a single item into the ring, blocking while it is full."""
+        if isinstance(item, (bytes, bytearray)):
+            data, flag = item, 0
+        elif isinstance(item, list) and item and \
+                all(isinstance(m, (bytes, bytearray)) for m in item):
+            # Batches of raw byte messages cross as length-prefixed bytes
+            # with no pickling on either side; live client batches hold
+            # parsed frame objects and fall through to pickle below
+            data, flag = _pack_batch(item), 2
+        else:
+            data, flag = pickle.dumps(item), 1
+        needed = _FRAME_HEADER.size + len(data)
+        # A frame can require up to needed - 1 bytes of end-of-buffer padding
+        # on top of its own size; capping frames at half the ring keeps the
+        # space check below satisfiable once consumers drain, where a larger
+        # frame would spin in the full-ring wait forever
+        if needed > self._size // 2:
+            raise ValueError(
+                f"item of {len(data)} bytes exceeds ring frame capacity "
+                f"({self._size // 2 - _FRAME_HEADER.size} bytes)")
+
+        buf = self._shm.buf
+        while True:
+            pos = self._head.value % self._size
+            remainder = self._size - pos
+            # Frames never wrap; pad to the end of the buffer when one won't fit
+            padding = remainder if remainder < needed else 0
+            free = self._size - (self._head.value - self._tail.value)
+            if free >= needed + padding:
+                break
+            time.sleep(0.001)
+
+        if padding:
+            if remainder >= _FRAME_HEADER.size:
+                _FRAME_HEADER.pack_into(buf, pos, _FRAME_SKIP, 0)
+            self._head.value += padding
+            pos = 0
+        _FRAME_HEADER.pack_into(buf, pos, len(data), flag)
+        buf[pos + _FRAME_HEADER.size:pos + needed] = data
+        self._head.value += needed
+        self._items.release()
+
+    def put_many(self, items):
+        """Write a list of items into the ring."""
+        for item in items:
+            self.put(item)
+
+    def _pop(self):
+        """Pop one frame; caller holds the consumer lock and a semaphore token."""
+        buf = self._shm.buf
+        while True:
+            pos = self._tail.value % self._size
+            remainder = self._size - pos
+            if remainder < _FRAME_HEADER.size:
+                self._tail.value += remainder
+                continue
+            length, flag = _FRAME_HEADER.unpack_from(buf, pos)
+            if length == _FRAME_SKIP:
+                self._tail.value += remainder
+                continue
+            start = pos + _FRAME_HEADER.size
+            data = bytes(buf[start:start + length])
+            self._tail.value += _FRAME_HEADER.size + length
+            if flag == 1:
+                return pickle.loads(data)
+            if flag == 2:
+                return _unpack_batch(data)
+            return data
+
+    def get_many(self, max_messages_to_get=GET_MANY_MAX, timeout=1):
+        """
+        Pop up to max_messages_to_get items, blocking up to timeout for the first.
+
+        Args:
+            max_messages_to_get: Maximum number of items to return
+            timeout: Seconds to wait for the first item
+
+        Returns:
+            A non-empty list of items
+
+        Raises:
+            queue.Empty: If no item arrives within the timeout
+        """
+        if not self._items.acquire(timeout=timeout):
+            raise Empty
+        with self._consumer_lock:
+            items = [self._pop()]
+            while len(items) < max_messages_to_get and self._items.acquire(block=False):
+                items.append(self._pop())
+        return items
+
+    def qsize(self):
+        """Approximate number of queued frames, for lag diagnostics."""
+        try:
+            return self._items.get_value()
+        except NotImplementedError:
+            return 0  # macOS semaphores cannot report their value
+
+    def close(self):
+        """Detach from the shared memory block, unlinking it in the owner."""
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class TurboQueue:
+    """
+    Shared-nothing file-based queue backed by SQLite batch files.
+
+    The producer writes each put as a SQLite file under a spool directory
+    with a .load suffix and renames it to .ready once committed; consumers
+    claim a .ready file by renaming it to .unload.<pid> — rename is atomic on
+    POSIX, so claiming needs no shared lock at all — then read every row in
+    one SELECT and delete the file. With batched puts this scales linearly
+    with consumers because processes never touch a common mutex.
+    """
+
+    def __init__(self, directory=None):
+        self._dir = directory or tempfile.mkdtemp(prefix='skyscraper-queue-')
+        self._seq = 0
+
+    def __getstate__(self):
+        return self._dir
+
+    def __setstate__(self, state):
+        self._dir = state
+        self._seq = 0
+
+    def put(self, item):
+        """Write a single item as a one-row batch file."""
+        self.put_many([item])
+
+    def put_many(self, items):
+        """
+        Write a list of items as one SQLite batch file.
+
+        Args:
+            items: The items to enqueue; bytes are stored raw, anything else
+                is pickled behind a flag column
+        """
+        rows = []
+        for item in items:
+            if isinstance(item, (bytes, bytearray)):
+                rows.append((0, sqlite3.Binary(item)))
+            else:
+                rows.append((1, sqlite3.Binary(pickle.dumps(item))))
+        self._seq += 1
+        name = f"{time.time_ns()}-{os.getpid()}-{self._seq}"
+        load_path = os.path.join(self._dir, name + '.load')
+        conn = sqlite3.connect(load_path)
+        try:
+            conn.execute("CREATE TABLE msgs (id INTEGER PRIMARY KEY, flag INTEGER, blob BLOB)")
+            conn.executemany("INSERT INTO msgs (flag, blob) VALUES (?, ?)", rows)
+            conn.commit()
+        finally:
+            conn.close()
+        os.rename(load_path, os.path.join(self._dir, name + '.ready'))
+
+    def _claim(self):
+        """Atomically claim one ready batch file, or return None."""
+        for name in sorted(os.listdir(self._dir)):
+            if not name.endswith('.ready'):
+                continue
+            ready_path = os.path.join(self._dir, name)
+            claimed_path = f"{ready_path[:-len('.ready')]}.unload.{os.getpid()}"
+            try:
+                os.rename(ready_path, claimed_path)
+            except OSError:
+                continue  # Another consumer claimed it first
+            return claimed_path
+        return None
+
+    def get_many(self, max_messages_to_get=GET_MANY_MAX, timeout=1):
+        """
+        Claim one batch file and return its items, waiting up to timeout.
+
+        The whole file is drained regardless of max_messages_to_get so the
+        claim/delete cycle stays one file per dequeue.
+
+        Args:
+            max_messages_to_get: Accepted for interface compatibility
+            timeout: Seconds to wait for a batch file to appear
+
+        Returns:
+            A non-empty list of items
+
+        Raises:
+            queue.Empty: If no batch file appears within the timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            claimed_path = self._claim()
+            if claimed_path is not None:
+                break
+            if time.time() >= deadline:
+                raise Empty
+            time.sleep(0.005)
+        conn = sqlite3.connect(claimed_path)
+        try:
+            rows = conn.execute("SELECT flag, blob FROM msgs ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        os.remove(claimed_path)
+        return [pickle.loads(blob) if flag else bytes(blob) for flag, blob in rows]
+
+    def qsize(self):
+        """Number of unclaimed batch files, for lag diagnostics."""
+        return sum(1 for name in os.listdir(self._dir) if name.endswith('.ready'))
+
+
+class RoundRobinFan:
+    """
+    Producer-side view over per-worker ingest queues.
+
+    The client holds one of these and calls put as before; each put lands on
+    the next shard in rotation, so consumers drain private queues and never
+    contend on a shared lock.
+    """
+
+    def __init__(self, queues):
+        self._queues = queues
+        self._next = 0
+
+    def put(self, item):
+        """Put a single item on the next shard in rotation."""
+        self._queues[self._next].put(item)
+        self._next = (self._next + 1) % len(self._queues)
+
+    def put_many(self, items):
+        """Put a list of items, rotating shards per item."""
+        for item in items:
+            self.put(item)
+
+
+def create_ingest_queue(backend='auto', size_bytes=None):
+    """
+    Create one queue carrying firehose messages from the client to workers.
+
+    Args:
+        backend: 'auto' picks faster-fifo when installed and the shared-memory
+            ring otherwise; 'faster-fifo', 'ring', 'sqlite', and 'queue' force
+            a specific backend
+        size_bytes: Optional shared-memory budget for the byte-sized backends
+
+    Returns:
+        A queue object with put/put_many/get_many methods
+    """
+    if backend == 'auto':
+        backend = 'faster-fifo' if faster_fifo is not None else 'ring'
+    if backend == 'faster-fifo':
+        if faster_fifo is None:
+            raise RuntimeError("faster-fifo backend requested but the package is not installed")
+        return faster_fifo.Queue(max_size_bytes=size_bytes or INGEST_QUEUE_BYTES)
+    if backend == 'ring':
+        return SharedMemoryRing(size=size_bytes or RING_BYTES)
+    if backend == 'sqlite':
+        return TurboQueue()
+    if backend == 'queue':
+        return QueueTransport()
+    raise ValueError(f"Unknown queue backend: {backend!r}")
+
+
+def create_ingest_queues(backend='auto', num_shards=1, in_process=False):
+    """
+    Create one ingest queue per worker, splitting the shared buffer budget.
+
+    Each worker drains its own shard, so get calls never contend on a common
+    lock; the client spreads batches across shards via RoundRobinFan and an
+    idle worker steals from its neighbour to absorb load imbalance.
+
+    Args:
+        backend: Backend name passed through to create_ingest_queue
+        num_shards: Number of queues to create, normally one per worker
+        in_process: True when client and workers all run in one process, in
+            which case 'auto' picks the no-pickle in-process transport
+
+    Returns:
+        A list of queue objects with put/put_many/get_many methods
+    """
+    if backend == 'auto' and in_process:
+        return [ThreadTransport() for _ in range(num_shards)]
+    if backend == 'auto':
+        backend = 'faster-fifo' if faster_fifo is not None else 'ring'
+    size_bytes = None
+    if backend == 'faster-fifo':
+        size_bytes = INGEST_QUEUE_BYTES // num_shards
+    elif backend == 'ring':
+        size_bytes = RING_BYTES // num_shards
+    return [create_ingest_queue(backend, size_bytes) for _ in range(num_shards)]
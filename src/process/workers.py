@@ -1,35 +1,122 @@
 """
-Processes firehose messages from a queue, updating shared data structures with post information. 
-It uses a stop_event to gracefully halt processing and ensures thread-safety with a lock.
+Processes firehose messages from a queue, batching post data locally and flushing
+batches to a results queue. It uses a stop_event to gracefully halt processing.
 
 """
-from atproto import parse_subscribe_repos_message, CAR, IdResolver, DidInMemoryCache
+from queue import Empty
 from .firehose_handlers import handle_firehose_message
-import multiprocessing
+from .persistence import DirectWriter, _serialize_batch
+from .transport import GET_MANY_MAX
+import time
 
+# Flush a worker's local batch once it reaches this many posts...
+BATCH_SIZE = 500
+# ...or once this many seconds have passed since the last flush.
+BATCH_INTERVAL = 1.0
 
-def worker_process(queue, posts_dict, posts_list, verbose, post_count, lock, stop_event):
+# Publish the local post count to the shared counter slot every N posts when
+# no post limit is set; with a limit the count is published on every dequeue
+COUNTER_PUBLISH_EVERY = 256
+
+# Seconds between backlog reports in verbose mode; a persistently non-zero
+# backlog means the workers are not keeping up with the firehose
+LAG_LOG_INTERVAL = 5.0
+
+
+def worker_process(queues, results_queue, out_queue, resolver, post_counts, worker_id,
+                   post_limit, verbose, stop_event):
     """
     Worker process that processes messages from the firehose queue.
-    
+
+    Each worker drains its own ingest queue shard, so dequeues never contend
+    with other workers; when the shard runs dry it steals one batch from its
+    neighbour to absorb load imbalance. Posts are accumulated in a local batch
+    and flushed to the results queue every BATCH_SIZE posts or BATCH_INTERVAL
+    seconds, so the hot path never touches shared state or takes a lock. When
+    an output file is configured, each flushed batch is also serialized once
+    and pushed to the writer queue. The worker that observes the summed
+    counters crossing post_limit sets the stop event itself, so the monitor
+    never has to poll the count.
+
     Args:
-        queue: A multiprocessing Queue containing firehose messages
-        posts_dict: A shared dictionary for storing posts indexed by URI
-        posts_list: A shared list for storing posts in order of collection
+        queues: The per-worker ingest queue shards; this worker owns
+            queues[worker_id] and only steals from its neighbour when idle
+        results_queue: A multiprocessing Queue for flushing batches of posts
+        out_queue: A bounded multiprocessing Queue feeding the writer process,
+            a DirectWriter appending straight to the output file, or None
+        resolver: A ResolverClient for the shared resolver process
+        post_counts: The sharded per-worker post counters
+        worker_id: Index of this worker's slot in post_counts; only this
+            worker writes that slot, so no lock is taken
+        post_limit: Optional limit on the number of posts to collect
         verbose: Boolean flag indicating whether to print verbose output
-        post_count: Shared counter for tracking the number of posts processed
-        lock: A multiprocessing Lock for thread-safe operations
         stop_event: A multiprocessing Event that signals when to stop processing
     """
-    resolver = IdResolver(cache=DidInMemoryCache())
+    post_count = post_counts[worker_id]
+    # Count locally and publish to the shared slot only periodically; the
+    # monitor tolerates a slightly stale count, and a post limit tightens
+    # publishing to every dequeue
+    local_count = 0
+    published = 0
+    publish_every = 1 if post_limit else COUNTER_PUBLISH_EVERY
+    local_batch = []
+    local_index = {}
+    last_flush = time.time()
+
+    def flush():
+        nonlocal local_batch, local_index, last_flush
+        if local_batch:
+            if isinstance(out_queue, DirectWriter):
+                # Direct-write mode: append to the shared output fd here
+                # instead of shipping the batch to the writer process
+                out_queue.write_batch(local_batch)
+            elif out_queue is not None:
+                out_queue.put(_serialize_batch(local_batch))
+            results_queue.put(local_batch)
+            local_batch = []
+            local_index = {}
+        last_flush = time.time()
+
+    own_queue = queues[worker_id]
+    neighbour_queue = queues[(worker_id + 1) % len(queues)]
+    last_lag_log = time.time()
+
     while not stop_event.is_set():
         try:
-            # Get a message from the queue with a timeout to check stop_event periodically
-            message = queue.get(timeout=1)
-            handle_firehose_message(message, resolver, posts_dict, posts_list, verbose, post_count, lock)
-        except multiprocessing.queues.Empty:
-            continue
+            # Pop batches of messages with a timeout to check stop_event periodically;
+            # the client enqueues lists of frames, not single messages
+            batches = own_queue.get_many(max_messages_to_get=GET_MANY_MAX, timeout=1)
+        except Empty:
+            # Own shard is dry; steal one batch from the neighbour so a slow
+            # worker cannot strand messages on its shard
+            try:
+                batches = neighbour_queue.get_many(max_messages_to_get=1, timeout=0)
+            except Empty:
+                batches = None
+        try:
+            if batches:
+                pending_before = len(local_batch)
+                for messages in batches:
+                    for message in messages:
+                        handle_firehose_message(message, resolver, local_batch, local_index, verbose)
+                local_count += len(local_batch) - pending_before
+                if local_count - published >= publish_every:
+                    # Single-writer counter slot: a plain store, no lock needed
+                    post_count.value = local_count
+                    published = local_count
+                    # Signal the limit ourselves for an immediate monitor wake-up
+                    if post_limit and sum(c.value for c in post_counts) >= post_limit:
+                        stop_event.set()
         except Exception as e:
             print(f"Worker error: {e}")
 
+        if len(local_batch) >= BATCH_SIZE or time.time() - last_flush >= BATCH_INTERVAL:
+            flush()
+
+        if verbose and time.time() - last_lag_log >= LAG_LOG_INTERVAL:
+            print(f"Worker {worker_id}: {own_queue.qsize()} batches queued")
+            last_lag_log = time.time()
 
+    # Flush whatever remains and publish the final count before exiting
+    flush()
+    post_count.value = local_count
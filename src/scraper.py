@@ -1,68 +1,161 @@
 """
 Main module for collecting posts from the Bluesky firehose and storing them in memory.
-Provides a FirehoseScraper class and a command-line interface.
+Provides the SkyScraper class; the command-line interface lives in main.py.
 """
 
-from .client.client import start_client_process
+from .client.client import start_client_process, start_client_thread
 from .process.workers import worker_process
-from atproto import DidInMemoryCache, IdResolver
-import multiprocessing
+from .process.persistence import DirectWriter, writer_process
+from .process.resolver import LocalResolver, ResolverClient, resolver_process
+from .process.transport import MP_CONTEXT, RoundRobinFan, create_ingest_queues
+from queue import Empty, Queue
+import threading
 import time
+import os
+import random
+import selectors
 import signal
-import sys
-import json
-import argparse
-from datetime import datetime
 
 
 class SkyScraper:
     """
     A class for collecting posts from the Bluesky firehose and storing them in memory.
-    
+
     Attributes:
-        post_count: Shared counter for tracking the number of posts processed
+        post_count: Number of posts collected so far (owned by the collector thread)
+        post_counts: Sharded per-worker counters summed for the post limit check
         verbose: Boolean flag indicating whether to print verbose output
-        num_workers: Number of worker processes to use
-        queue: A multiprocessing Queue for passing messages between processes
+        num_workers: Number of workers to use
+        mode: 'process' to run workers as processes, 'thread' to run them as
+            threads sharing the collector queue and resolver in-process
+        queues: Per-worker ingest queue shards carrying firehose messages from
+            the client, which round-robins batches across them
+        results_queue: A multiprocessing Queue carrying batches of posts from workers
+        output_file: Optional path of a JSONL file to append collected posts to
+        writer_mode: 'process' routes serialized batches through a dedicated
+            writer process; 'direct' lets workers append to the file themselves
+        out_queue: A bounded multiprocessing Queue feeding the writer process,
+            or a DirectWriter in direct mode
         stop_event: A multiprocessing Event for signaling processes to stop
-        lock: A multiprocessing Lock for thread-safe operations
-        posts_dict: A shared dictionary for storing posts indexed by URI
-        posts_list: A shared list for storing posts in order of collection
+        posts_dict: A dictionary of collected posts indexed by URI
+        posts_list: A list of collected posts in order of collection
     """
-    
-    def __init__(self, verbose=False, num_workers=4):
+
+    # Upper bound on serialized batches queued for the writer; provides
+    # backpressure if the disk cannot keep up with the firehose
+    WRITER_QUEUE_SIZE = 1000
+
+    # Client restart backoff: first delay, cap, and the uptime after which
+    # a restarted client is considered healthy and the backoff resets
+    CLIENT_BACKOFF_START = 1.0
+    CLIENT_BACKOFF_CAP = 60.0
+    CLIENT_HEALTHY_SECS = 60.0
+
+    def __init__(self, output_file=None, verbose=False, num_workers=4, mode='thread',
+                 queue_backend='auto', writer_mode='process'):
         """
-        Initialize the FirehoseScraper.
-        
+        Initialize the SkyScraper.
+
         Args:
+            output_file: Optional path of a JSONL file to append collected posts to
             verbose: Boolean flag indicating whether to print verbose output
-            num_workers: Number of worker processes to use
+            num_workers: Number of workers to use
+            mode: 'thread' (default) or 'process' worker execution mode
+            queue_backend: Ingest queue backend passed to create_ingest_queue
+            writer_mode: 'process' (default) or 'direct' output writing mode
         """
-        self.post_count = multiprocessing.Value('i', 0)  # Shared integer counter
+        if mode not in ('process', 'thread'):
+            raise ValueError(f"Unknown mode: {mode!r} (expected 'process' or 'thread')")
+        if writer_mode not in ('process', 'direct'):
+            raise ValueError(
+                f"Unknown writer mode: {writer_mode!r} (expected 'process' or 'direct')")
+        self.mode = mode
+        self.writer_mode = writer_mode
+        self.post_count = 0
+        # One counter slot per worker; each slot has a single writer, so no
+        # lock is needed and the monitor just sums them
+        self.post_counts = [MP_CONTEXT.Value('q', 0, lock=False) for _ in range(num_workers)]
         self.start_time = None
-        self.cache = DidInMemoryCache() 
-        self.resolver = IdResolver(cache=self.cache)
         self.verbose = verbose
-        self.queue = multiprocessing.Queue()
+        # One ingest queue shard per worker; the client fans batches across
+        # them so dequeues never contend on a shared lock. Thread mode runs
+        # the client in-process too, so auto picks the no-pickle transport.
+        self.queues = create_ingest_queues(queue_backend, num_workers,
+                                           in_process=(mode == 'thread'))
         self.num_workers = num_workers
         self.workers = []
-        self.stop_event = multiprocessing.Event()
-        self.lock = multiprocessing.Lock()  # For thread-safe data structures
+        self.stop_event = MP_CONTEXT.Event()
         self.client_proc = None
-        
-        # In-memory storage for posts
-        self.manager = multiprocessing.Manager()
-        self.posts_dict = self.manager.dict()  # Indexed by URI for quick lookups
-        self.posts_list = self.manager.list()  # Ordered as collected
+
+        # Shared DID resolver process; workers send (worker_id, did) requests
+        # and receive replies on their own response queue. Thread mode shares
+        # a LocalResolver object instead.
+        if mode == 'process':
+            self.resolver_request_queue = MP_CONTEXT.Queue()
+            self.resolver_response_queues = [MP_CONTEXT.Queue() for _ in range(num_workers)]
+        self.resolver_proc = None
+
+        # Optional JSONL output, handled by a single writer process or — in
+        # direct mode — appended by the workers themselves via atomic
+        # O_APPEND writes with no lock and no extra hop. Posts are written
+        # to a .partial file that is renamed into place on clean shutdown,
+        # so a crashed run never leaves a partial file that looks complete.
+        self.output_file = output_file
+        self._partial_path = output_file + '.partial' if output_file else None
+        if output_file and writer_mode == 'direct':
+            self.out_queue = DirectWriter(self._partial_path)
+        elif output_file:
+            self.out_queue = MP_CONTEXT.Queue(maxsize=self.WRITER_QUEUE_SIZE)
+        else:
+            self.out_queue = None
+        self.writer_proc = None
+
+        # In-memory storage for posts. Workers batch posts onto results_queue;
+        # only the collector thread writes to these, so no locking is needed.
+        # Thread mode uses an in-process queue, so batches are never pickled.
+        self.results_queue = Queue() if mode == 'thread' else MP_CONTEXT.Queue()
+        self.collector_thread = None
+        # Set once every worker has been joined; gates the collector's exit
+        # so the final batches cannot race it out of the queue
+        self._workers_done = threading.Event()
+        self.posts_dict = {}  # Indexed by URI for quick lookups
+        self.posts_list = []  # Ordered as collected
+
+    def _collect_batches(self):
+        """
+        Drain batches of posts from the results queue into the in-memory collections.
+
+        Runs in a single thread in the main process, so no lock is required.
+        Exits only after every worker has been joined and the queue has gone
+        quiet — the stop event alone is not enough, because workers flush
+        their final batches up to a second after it is set.
+        """
+        # Hoist attribute lookups out of the drain loop; this thread is the
+        # only writer, so plain locals are safe
+        posts_dict = self.posts_dict
+        extend = self.posts_list.extend
+        get = self.results_queue.get
+        stopping = self._workers_done.is_set
+        while True:
+            try:
+                batch = get(timeout=0.5)
+            except Empty:
+                if stopping():
+                    break
+                continue
+            for post_data in batch:
+                posts_dict[post_data['uri']] = post_data
+            extend(batch)
+            self.post_count += len(batch)
 
     def start_collection(self, duration_seconds=None, post_limit=None):
         """
         Start collecting posts from the firehose.
-        
+
         Args:
             duration_seconds: Optional duration in seconds to collect posts
             post_limit: Optional limit on the number of posts to collect
-            
+
         Returns:
             A tuple of (posts_dict, posts_list) containing the collected posts
         """
@@ -70,84 +163,160 @@ class SkyScraper:
         self.start_time = time.time()
         end_time = self.start_time + duration_seconds if duration_seconds else None
 
-        # Start worker processes to process firehose messages
-        for _ in range(self.num_workers):
-            p = multiprocessing.Process(
-                target=worker_process,
-                args=(
-                    self.queue, 
-                    self.posts_dict, 
-                    self.posts_list,
-                    self.verbose, 
-                    self.post_count, 
-                    self.lock, 
-                    self.stop_event
-                )
+        # Start the collector thread that aggregates batches from workers
+        self.collector_thread = threading.Thread(target=self._collect_batches, daemon=True)
+        self.collector_thread.start()
+
+        # Start the writer process that owns the output file, if requested;
+        # direct mode has no writer process at all
+        if self.output_file and self.writer_mode == 'process':
+            self.writer_proc = MP_CONTEXT.Process(
+                target=writer_process,
+                args=(self.out_queue, self._partial_path, post_limit)
             )
+            self.writer_proc.start()
+
+        # Start the shared DID resolver process; thread mode resolves through
+        # a shared in-process object instead
+        local_resolver = None
+        if self.mode == 'process':
+            self.resolver_proc = MP_CONTEXT.Process(
+                target=resolver_process,
+                args=(self.resolver_request_queue, self.resolver_response_queues, self.stop_event)
+            )
+            self.resolver_proc.start()
+        else:
+            local_resolver = LocalResolver()
+
+        # Start workers to process firehose messages
+        for i in range(self.num_workers):
+            if self.mode == 'process':
+                resolver_client = ResolverClient(
+                    i, self.resolver_request_queue, self.resolver_response_queues[i]
+                )
+                p = MP_CONTEXT.Process(
+                    target=worker_process,
+                    args=(
+                        self.queues,
+                        self.results_queue,
+                        self.out_queue,
+                        resolver_client,
+                        self.post_counts,
+                        i,
+                        post_limit,
+                        self.verbose,
+                        self.stop_event
+                    )
+                )
+            else:
+                p = threading.Thread(
+                    target=worker_process,
+                    args=(
+                        self.queues,
+                        self.results_queue,
+                        self.out_queue,
+                        local_resolver,
+                        self.post_counts,
+                        i,
+                        post_limit,
+                        self.verbose,
+                        self.stop_event
+                    ),
+                    daemon=True
+                )
             p.start()
             self.workers.append(p)
 
-        # Handle keyboard interrupts in the main process
-        def signal_handler(sig, frame):
-            print("\nCollection stopped by user.")
-            self._stop_collection()
-            sys.exit(0)
-
-        signal.signal(signal.SIGINT, signal_handler)
+        # Route SIGINT through a wakeup pipe instead of handler code: the
+        # monitor sees Ctrl-C as a readable fd, so no Python runs in
+        # interrupt context and nothing races a blocking wait
+        sig_r, sig_w = os.pipe()
+        os.set_blocking(sig_w, False)
+        signal.set_wakeup_fd(sig_w)
+        signal.signal(signal.SIGINT, lambda signum, frame: None)
 
-        # Main collection loop - will retry if client disconnects
-        while True:
-            # Start the client in a separate process
-            self.client_proc = start_client_process(self.queue, self.stop_event)
+        # Bridge the stop event onto a pipe so one selector waits on both
+        stop_r, stop_w = os.pipe()
 
-            # Monitor the collection and check for stopping conditions
+        def pipe_stop():
+            self.stop_event.wait()
             try:
-                while True:
-                    if self.stop_event.is_set():
-                        break
-                        
-                    # Check time limit
-                    if duration_seconds and time.time() > end_time:
-                        print("\nTime limit reached.")
-                        self._stop_collection()
-                        break
-                        
-                    # Check post limit
-                    elif post_limit and self.post_count.value >= post_limit:
-                        print("\nPost limit reached.")
-                        self._stop_collection()
-                        break
-                        
-                    # Check if client is still running
-                    if not self.client_proc.is_alive():
-                        if not self.stop_event.is_set():
-                            # Client process exited unexpectedly
-                            print("\nClient process exited unexpectedly.")
-                            self._stop_collection()
-                            break
-                        else:
-                            # Stop event is set; exit the loop
-                            break
-                            
-                    time.sleep(1)
-                else:
-                    # If the collection completed successfully, break out of the retry loop
-                    break
-                    
-                if self.stop_event.is_set():
-                    break
-                    
-            except KeyboardInterrupt:
-                print("\nCollection interrupted by user.")
-                self._stop_collection()
-                break
-                
-            except Exception as e:
-                error_details = f"{type(e).__name__}: {str(e)}" if str(e) else f"{type(e).__name__}"
-                print(f"\nConnection error: {error_details}")
+                os.write(stop_w, b'\0')
+            except OSError:
+                pass
+
+        bridge = threading.Thread(target=pipe_stop, daemon=True)
+        bridge.start()
+
+        # Start the client, watched by a thread that restarts it with
+        # backoff if it dies, so nothing needs to poll it. Thread mode keeps
+        # the client in this process, so the whole app fits in one process.
+        fan = RoundRobinFan(self.queues)
+        self.client_proc = self._start_client(fan)
+        threading.Thread(target=self._watch_client, args=(fan,), daemon=True).start()
+
+        # Wait for a stop signal with no polling: workers set the event at
+        # the post limit, SIGINT arrives on its pipe, and the time limit is
+        # the only timeout. A dead client is restarted with backoff rather
+        # than ending the run, so without a time or post limit this waits
+        # through even a permanent firehose outage until Ctrl-C
+        remaining = max(0.0, end_time - time.time()) if end_time else None
+        selector = selectors.DefaultSelector()
+        selector.register(sig_r, selectors.EVENT_READ, 'interrupt')
+        selector.register(stop_r, selectors.EVENT_READ, 'stop')
+        try:
+            events = selector.select(timeout=remaining)
+        finally:
+            selector.close()
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+        reasons = {key.data for key, _ in events}
+        if 'interrupt' in reasons:
+            os.read(sig_r, 64)
+            print("\nCollection stopped by user.")
+        elif 'stop' in reasons:
+            if post_limit and sum(c.value for c in self.post_counts) >= post_limit:
+                print("\nPost limit reached.")
+        else:
+            print("\nTime limit reached.")
 
         self._stop_collection()
-        return dict(self.posts_dict), list(self.posts_list)
+        bridge.join(timeout=1)
+        for fd in (sig_r, sig_w, stop_r, stop_w):
+            os.close(fd)
+        return self.posts_dict, self.posts_list
+
+    def _start_client(self, fan):
+        """Start the firehose client as a thread or process per the mode."""
+        if self.mode == 'thread':
+            return start_client_thread(fan, self.stop_event)
+        return start_client_process(fan, self.stop_event)
+
+    def _watch_client(self, fan):
+        """
+        Restart the client with exponential backoff when it dies.
+
+        Runs in a daemon thread; a clean shutdown sets the stop event first,
+        so only an unexpected client exit triggers a restart. The delay
+        doubles from CLIENT_BACKOFF_START up to CLIENT_BACKOFF_CAP with
+        jitter, so a firehose outage idles between attempts instead of
+        spinning on process spawns, and it resets once a client stays up
+        for CLIENT_HEALTHY_SECS.
+        """
+        backoff = self.CLIENT_BACKOFF_START
+        while True:
+            started = time.time()
+            self.client_proc.join()
+            if self.stop_event.is_set():
+                return
+            if time.time() - started >= self.CLIENT_HEALTHY_SECS:
+                backoff = self.CLIENT_BACKOFF_START
+            delay = backoff + random.uniform(0, backoff / 2)
+            backoff = min(backoff * 2, self.CLIENT_BACKOFF_CAP)
+            print(f"\nClient exited unexpectedly; restarting in {delay:.1f}s...")
+            if self.stop_event.wait(timeout=delay):
+                return
+            self.client_proc = self._start_client(fan)
 
     def _stop_collection(self):
         """
@@ -156,31 +325,70 @@ class SkyScraper:
         if not self.stop_event.is_set():
             self.stop_event.set()
 
-        # Terminate client process if still running
+        # Terminate the client if still running; the client thread is a
+        # daemon and stops itself on the next received frame
         if self.client_proc and self.client_proc.is_alive():
-            self.client_proc.terminate()
-            self.client_proc.join()
+            if self.mode == 'process':
+                self.client_proc.terminate()
+                self.client_proc.join()
+            else:
+                self.client_proc.join(timeout=1)
 
-        # Wait for all worker processes to finish
+        # Wait for all workers to flush their final batches and exit on the
+        # stop event; only stragglers get terminated in process mode
         for p in self.workers:
-            if p.is_alive():
+            p.join(timeout=5)
+            if self.mode == 'process' and p.is_alive():
                 p.terminate()
-            p.join()
+                p.join()
+        self._workers_done.set()
+
+        # Stop the shared resolver process
+        if self.resolver_proc and self.resolver_proc.is_alive():
+            self.resolver_proc.terminate()
+            self.resolver_proc.join()
+
+        # Let the collector drain any batches still in flight
+        if self.collector_thread and self.collector_thread.is_alive():
+            self.collector_thread.join(timeout=5)
+
+        # Tell the writer the stream is complete: the workers are joined, so
+        # a sentinel enqueued now sits behind every batch they flushed and
+        # the writer exits only once the queue is fully drained
+        if self.writer_proc:
+            self.out_queue.put(None)
+            self.writer_proc.join(timeout=5)
+            if self.writer_proc.is_alive():
+                self.writer_proc.terminate()
+                self.writer_proc.join()
+
+        # Rename the finished .partial file into place — atomic on POSIX,
+        # so the output path only ever holds a complete run
+        if self._partial_path and os.path.exists(self._partial_path):
+            os.replace(self._partial_path, self.output_file)
+
+        # Release the ingest queue shards; the shared-memory ring unlinks
+        # its segment here instead of leaking it to the resource tracker
+        for q in self.queues:
+            if hasattr(q, 'close'):
+                q.close()
 
         # Print collection statistics
         elapsed = time.time() - self.start_time if self.start_time else 0
-        rate = self.post_count.value / elapsed if elapsed > 0 else 0
+        rate = self.post_count / elapsed if elapsed > 0 else 0
         print("\nCollection complete!")
-        print(f"Collected {self.post_count.value} posts in {elapsed:.2f} seconds")
+        print(f"Collected {self.post_count} posts in {elapsed:.2f} seconds")
         print(f"Average rate: {rate:.1f} posts/sec")
-        print(f"Posts stored in memory")
-        
+        if self.output_file:
+            print(f"Posts saved to {self.output_file}")
+        else:
+            print(f"Posts stored in memory")
+
     def get_collected_posts(self):
         """
         Return the collected posts.
-        
+
         Returns:
             A tuple of (posts_dict, posts_list) containing the collected posts
         """
-        return dict(self.posts_dict), list(self.posts_list)
-
+        return self.posts_dict, self.posts_list